@@ -1,42 +1,123 @@
 import streamlit as st
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 import pandas as pd
+import httpx
 import os
 import logging
+from logging.handlers import MemoryHandler, RotatingFileHandler
+import itertools
+import threading
 import time
-from datetime import time as dt_time, datetime, timedelta
+from datetime import time as dt_time, datetime
 from dotenv import load_dotenv
 
 # --- Basic Setup ---
 load_dotenv(override=True)
 st.set_page_config(page_title="Product Availability Editor", layout="wide")
 
+# Columns the admin is allowed to edit in the data editor
+EDITABLE_COLUMNS = ['available_from', 'available_to', 'allow_negative']
+EDITABLE_COLUMN_SET = frozenset(EDITABLE_COLUMNS)
+
+# Organizations whose products are loaded, as a comma-separated ORG_IDS env var.
+# All of them are fetched in one query with an IN filter.
+ORG_IDS = [org_id.strip() for org_id in os.getenv("ORG_IDS", "c4f3eed9-de25-4a7a-9664-7674e16b5bfd").split(",") if org_id.strip()]
+
+# Read-only product columns fetched for display. Add a column here to offer
+# it in the "Display Options" selector; 'code' is always required.
+PRODUCT_DISPLAY_COLUMNS = ['code', 'name']
+
+# Rows requested per page when reading from Supabase (PostgREST's default max-rows;
+# a lower server cap is handled by paging on the rows actually returned)
+FETCH_PAGE_SIZE = 1000
+
+# Cached products are served as-is until the soft TTL, then served stale while
+# a background refresh runs, and refetched synchronously after the hard TTL
+PRODUCTS_SOFT_TTL_SECONDS = 5 * 60
+PRODUCTS_HARD_TTL_SECONDS = 30 * 60
+
+# Maximum number of rows sent in a single update request
+UPDATE_BATCH_SIZE = 500
+
+# Row version maintained by a BEFORE UPDATE trigger; saves only apply if it is unchanged
+VERSION_COLUMN = 'updated_at'
+
+# Columns never offered as read-only product columns in "Display Options"
+HIDDEN_PRODUCT_COLUMN_SET = EDITABLE_COLUMN_SET | {VERSION_COLUMN}
+
+# Request timeout for the shared Supabase HTTP client (matches the postgrest default)
+HTTP_TIMEOUT_SECONDS = 120
+
+# Admin sessions expire this many seconds after login
+SESSION_TIMEOUT_SECONDS = 5 * 60
+
 # --- Logging Configuration ---
 log_file = 'app.log'
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler() # To also see logs in the console
-    ]
-)
+log_handler_name = 'app_log_file'
+
+def configure_logging():
+    """
+    Installs the root log handlers once per process. Streamlit re-executes this module on
+    every rerun and can clear cached resources, so the root logger itself is checked for
+    the handler installed on the first run.
+    """
+    root_logger = logging.getLogger()
+    if any(handler.get_name() == log_handler_name for handler in root_logger.handlers):
+        return
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    # Open the file lazily, cap its size, and buffer records so INFO logs don't hit disk one by one.
+    # Errors flush the buffer immediately.
+    file_handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3, delay=True)
+    file_handler.setFormatter(formatter)
+    buffered_file_handler = MemoryHandler(capacity=100, flushLevel=logging.ERROR, target=file_handler)
+    buffered_file_handler.set_name(log_handler_name)
+
+    stream_handler = logging.StreamHandler() # To also see logs in the console
+    stream_handler.setFormatter(formatter)
+
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(buffered_file_handler)
+    root_logger.addHandler(stream_handler)
+
+configure_logging()
 
 # --- Supabase Initialization ---
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
 
-if not supabase_url or not supabase_key:
-    st.toast("Supabase URL or Key not set. Check .env file.", icon="🔥")
-    logging.error("Supabase URL or Key not set.")
-    st.stop()
+@st.cache_resource
+def get_supabase() -> Client:
+    """Creates the Supabase client once and reuses it across script reruns."""
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
 
-try:
-    supabase: Client = create_client(supabase_url, supabase_key)
-    logging.info("Supabase client initialized successfully.")
-except Exception as e:
-    st.toast(f"Failed to connect to Supabase: {e}", icon="🔥")
-    logging.error(f"Supabase initialization failed: {e}")
+    if not supabase_url or not supabase_key:
+        st.toast("Supabase URL or Key not set. Check .env file.", icon="🔥")
+        logging.error("Supabase URL or Key not set.")
+        st.stop()
+
+    try:
+        # One long-lived HTTP/2 pool so table queries reuse the same TLS connection
+        http_client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=60),
+        )
+        client = create_client(supabase_url, supabase_key, options=ClientOptions(httpx_client=http_client))
+        logging.info("Supabase client initialized successfully.")
+        return client
+    except Exception as e:
+        st.toast(f"Failed to connect to Supabase: {e}", icon="🔥")
+        logging.error(f"Supabase initialization failed: {e}")
+        st.stop()
+
+# Fail fast on a missing configuration before rendering any page
+get_supabase()
+
+if not ORG_IDS:
+    st.toast("ORG_IDS is empty. Set at least one organization ID in .env.", icon="🔥")
+    logging.error("ORG_IDS is set but contains no organization IDs.")
     st.stop()
 
 
@@ -56,45 +137,226 @@ def format_time_for_editor(time_str_from_db):
         logging.warning(f"Could not parse time string '{time_str_from_db}'. Returning None.")
         return None
 
-@st.cache_data(ttl=300)
-def fetch_data():
+def parse_times_for_editor(time_strs_from_db):
+    """
+    Converts a Series of time strings from DB to datetime.time objects for the editor.
+    Products share a handful of availability windows, so each distinct string is parsed
+    once and the Series is mapped through the resulting dict.
+    """
+    parse_map = {s: format_time_for_editor(s) for s in time_strs_from_db.dropna().unique()}
+    parsed = time_strs_from_db.map(parse_map).astype(object)
+    return parsed.where(parsed.notna(), None)
+
+def patch_saved_rows(df, rows):
+    """
+    Writes the given rows' editable values and 'updated_at' into a products frame in place.
+    `rows` is indexed by code, like the session baseline.
+    """
+    mask = df['code'].isin(rows.index)
+    codes = df.loc[mask, 'code']
+    for col in rows.columns:
+        df.loc[mask, col] = rows.loc[codes, col].to_numpy()
+
+def with_saved_changes(df, rows):
+    """
+    Returns a copy of a products frame with the given rows patched in (see patch_saved_rows).
+    Used for the shared cache frame, which other sessions may be reading.
+    """
+    patched = df.copy()
+    patch_saved_rows(patched, rows)
+    return patched
+
+def load_products(supabase):
     """
     Fetches data from the 'products' table, including availability configuration.
-    The 'available_from', 'available_to', and 'allow_negative' columns are now expected
-    to be directly on the 'products' table.
+    Only PRODUCT_DISPLAY_COLUMNS, the editable 'available_from', 'available_to',
+    and 'allow_negative' columns, and the 'updated_at' row version are requested.
+    Raises on any failure; callers decide how to report it.
+    """
+    logging.info("Fetching data from 'products' table...")
+    selected = ",".join(PRODUCT_DISPLAY_COLUMNS + EDITABLE_COLUMNS + [VERSION_COLUMN])
+
+    # PostgREST caps each response at its max-rows setting, which may be below FETCH_PAGE_SIZE,
+    # so advance by the rows actually returned and stop only on an empty page.
+    # The query builder is mutated by range(), so a fresh one is built per page.
+    pages = []
+    start = 0
+    while True:
+        page = (
+            supabase.table("products")
+            .select(selected)
+            .in_("organization_id", ORG_IDS)
+            .order("code")
+            .range(start, start + FETCH_PAGE_SIZE - 1)
+            .execute()
+            .data
+        )
+        if not page:
+            break
+        pages.append(page)
+        start += len(page)
+    # Arrow-backed dtypes store strings and booleans column-wise instead of as Python objects
+    df_products = pd.DataFrame.from_records(itertools.chain.from_iterable(pages)).convert_dtypes(dtype_backend='pyarrow')
+
+    if 'code' not in df_products.columns:
+        raise ValueError("Product table must have a 'code' column.")
+
+    # 'code' is the join key for change detection and saves, so it must be unique
+    duplicated_codes = df_products.loc[df_products['code'].duplicated(), 'code'].unique()
+    if len(duplicated_codes):
+        raise ValueError(f"Duplicate product codes found: {', '.join(map(str, duplicated_codes))}")
+
+    # Apply formatting for editor display
+    df_products['available_from'] = parse_times_for_editor(df_products['available_from'])
+    df_products['available_to'] = parse_times_for_editor(df_products['available_to'])
+    # Ensure 'allow_negative' is boolean, default to False if None/NaN
+    df_products['allow_negative'] = df_products['allow_negative'].astype('bool[pyarrow]').fillna(False)
+
+    logging.info("Data fetched and processed successfully from 'products' table.")
+    return df_products
+
+@st.cache_resource
+def get_products_cache():
+    """Process-wide holder for the last products frame and when it was fetched."""
+    return {
+        'df': None, 'fetched_at': 0.0, 'generation': 0, 'refreshing': False,
+        'lock': threading.Lock(),
+        # Held for the whole of a synchronous load so concurrent cold reads share one fetch
+        'fetch_lock': threading.Lock(),
+    }
+
+def refresh_products_cache(cache, supabase, generation):
+    """
+    Reloads the products frame in the background, keeping the stale copy on failure.
+    The result is dropped if a save patched the cache after this refresh started.
     """
     try:
-        logging.info("Fetching data from 'products' table...")
-        # Fetch all columns, assuming available_from, available_to, allow_negative are now in 'products'
-        products_res = supabase.table("products").select("*").eq("organization_id", "c4f3eed9-de25-4a7a-9664-7674e16b5bfd").execute()
-        df_products = pd.DataFrame(products_res.data)
-
-        if 'code' not in df_products.columns:
-            st.toast("Product table must have a 'code' column.", icon="⚠️")
-            logging.error("Product table missing 'code' column.")
+        df = load_products(supabase)
+        with cache['lock']:
+            if cache['generation'] == generation:
+                cache['df'], cache['fetched_at'] = df, time.monotonic()
+    except Exception as e:
+        logging.error(f"Background refresh of products failed: {e}", exc_info=True)
+    finally:
+        with cache['lock']:
+            cache['refreshing'] = False
+
+def read_products_cache(cache, supabase):
+    """
+    Returns the cached frame if it is younger than PRODUCTS_HARD_TTL_SECONDS, starting a
+    background refresh once it is past PRODUCTS_SOFT_TTL_SECONDS. Returns None otherwise.
+    """
+    with cache['lock']:
+        df = cache['df']
+        age = time.monotonic() - cache['fetched_at']
+        if df is None or age >= PRODUCTS_HARD_TTL_SECONDS:
+            return None
+        if age >= PRODUCTS_SOFT_TTL_SECONDS and not cache['refreshing']:
+            cache['refreshing'] = True
+            threading.Thread(
+                target=refresh_products_cache, args=(cache, supabase, cache['generation']), daemon=True
+            ).start()
+        return df
+
+def fetch_data():
+    """
+    Returns the products frame using stale-while-revalidate caching.
+    A frame younger than PRODUCTS_SOFT_TTL_SECONDS is returned as-is. One younger than
+    PRODUCTS_HARD_TTL_SECONDS is returned immediately while a background thread refreshes it.
+    Anything older, or a cold cache, is fetched synchronously by one session while the
+    others wait for its result.
+    The returned frame is shared by every session and must not be mutated; copy it
+    before patching (see patch_session_data and with_saved_changes).
+    """
+    supabase = get_supabase()
+    cache = get_products_cache()
+
+    df = read_products_cache(cache, supabase)
+    if df is not None:
+        return df
+
+    with cache['fetch_lock']:
+        # Another session may have filled the cache while this one waited
+        df = read_products_cache(cache, supabase)
+        if df is not None:
+            return df
+
+        with cache['lock']:
+            generation = cache['generation']
+        try:
+            df = load_products(supabase)
+        except Exception as e:
+            st.toast(f"Error fetching data: {e}", icon="🔥")
+            logging.error(f"Error in fetch_data: {e}", exc_info=True)
             return pd.DataFrame()
 
-        # Ensure the new columns exist, providing defaults if they don't
-        # This is crucial if the columns might not be present in the DB yet
-        for col in ['available_from', 'available_to']:
-            if col not in df_products.columns:
-                df_products[col] = None
-        if 'allow_negative' not in df_products.columns:
-            df_products['allow_negative'] = False # Default to False if column doesn't exist
-
-        # Apply formatting for editor display
-        df_products['available_from'] = df_products['available_from'].apply(format_time_for_editor)
-        df_products['available_to'] = df_products['available_to'].apply(format_time_for_editor)
-        # Ensure 'allow_negative' is boolean, default to False if None/NaN
-        df_products['allow_negative'] = df_products['allow_negative'].fillna(False).astype(bool)
-        
-        logging.info("Data fetched and processed successfully from 'products' table.")
-        return df_products
+        with cache['lock']:
+            if cache['generation'] == generation:
+                cache['df'], cache['fetched_at'] = df, time.monotonic()
+    return df
 
-    except Exception as e:
-        st.toast(f"Error fetching data: {e}", icon="🔥")
-        logging.error(f"Error in fetch_data: {e}", exc_info=True)
-        return pd.DataFrame()
+def invalidate_products_cache(rows):
+    """
+    Patches just-saved rows (indexed by code, like the session baseline) into the cached
+    frame and marks it stale. The next read then serves the saved values and versions
+    while it refreshes in the background.
+    The patched copy is built outside the lock and swapped in only if the cached frame
+    was not replaced meanwhile; otherwise it is rebuilt from the newer frame.
+    """
+    cache = get_products_cache()
+    while True:
+        with cache['lock']:
+            df, generation = cache['df'], cache['generation']
+        patched = with_saved_changes(df, rows) if df is not None else None
+        with cache['lock']:
+            if cache['df'] is df and cache['generation'] == generation:
+                cache['df'] = patched
+                cache['generation'] += 1
+                cache['fetched_at'] = min(cache['fetched_at'], time.monotonic() - PRODUCTS_SOFT_TTL_SECONDS)
+                return
+
+def update_products(batch, versions):
+    """
+    Writes one batch of changed rows to the 'products' table in a single request, through
+    the update_product_availability SQL function (see README), limited to ORG_IDS.
+    Each row carries its 'code' plus only the changed fields, and is applied only while
+    its 'updated_at' still matches the version the editor loaded. Returns the new
+    'updated_at' per saved code and the list of codes whose rows were changed by someone
+    else in the meantime.
+    """
+    supabase = get_supabase()
+    changes = [{**update, VERSION_COLUMN: versions[update['code']]} for update in batch]
+    res = supabase.rpc("update_product_availability", {"changes": changes, "org_ids": ORG_IDS}).execute()
+    saved = {row['code']: row[VERSION_COLUMN] for row in res.data}
+    conflicts = [update['code'] for update in batch if update['code'] not in saved]
+    return saved, conflicts
+
+def fetch_current_versions(codes):
+    """Reads the current editable values and 'updated_at' of the given products in ORG_IDS, keyed by code."""
+    supabase = get_supabase()
+    res = (
+        supabase.table("products")
+        .select(",".join(['code'] + EDITABLE_COLUMNS + [VERSION_COLUMN]))
+        .in_("organization_id", ORG_IDS)
+        .in_("code", codes)
+        .execute()
+    )
+    current = pd.DataFrame.from_records(res.data, columns=['code'] + EDITABLE_COLUMNS + [VERSION_COLUMN]).set_index('code')
+    current['available_from'] = parse_times_for_editor(current['available_from'])
+    current['available_to'] = parse_times_for_editor(current['available_to'])
+    current['allow_negative'] = current['allow_negative'].fillna(False).astype(bool)
+    return current
+
+def patch_session_data(rows):
+    """
+    Writes saved or rebased rows into this session's editor data so it stays in step with
+    the baseline. The frame starts out shared with the products cache, so it is copied on
+    the first patch only and updated in place afterwards.
+    """
+    if not st.session_state.get('owns_original_data'):
+        st.session_state.original_data = st.session_state.original_data.copy()
+        st.session_state.owns_original_data = True
+    patch_saved_rows(st.session_state.original_data, rows)
 
 # --- Main Application UI ---
 
@@ -103,24 +365,29 @@ def main_app():
 
     if 'original_data' not in st.session_state:
         st.session_state.original_data = fetch_data()
+        st.session_state.owns_original_data = False
+        # Columns are fixed once loaded, so the read-only product columns are computed here, not on every rerun
+        st.session_state.product_columns = [col for col in st.session_state.original_data.columns if col not in HIDDEN_PRODUCT_COLUMN_SET]
     
     if st.session_state.original_data.empty:
         st.warning("No data to display.")
         return
 
+    # Keep only the editable columns and row version, keyed by code, as the baseline for change detection
+    if 'baseline' not in st.session_state:
+        st.session_state.baseline = st.session_state.original_data.set_index('code')[EDITABLE_COLUMNS + [VERSION_COLUMN]]
+
     # --- Column Selector ---
-    # Exclude time and boolean columns from initial selection for product columns
-    product_columns = [col for col in st.session_state.original_data.columns if col not in ['available_from', 'available_to', 'allow_negative']]
-    
+    # Time, boolean, and row version columns are excluded from the selectable product columns
     with st.expander("Display Options"):
         selected_columns = st.multiselect(
             "Choose product columns to display:",
-            options=product_columns,
+            options=st.session_state.product_columns,
             default=['code', 'name']
         )
 
     # Always include the time and allow_negative columns
-    display_columns = selected_columns + ['available_from', 'available_to', 'allow_negative']
+    display_columns = selected_columns + EDITABLE_COLUMNS
 
     edited_df = st.data_editor(
         st.session_state.original_data,
@@ -131,7 +398,7 @@ def main_app():
             "allow_negative": st.column_config.CheckboxColumn("Allow Negative", default=False), # Configured as a checkbox/toggle
         },
         # Disable all columns except the editable ones
-        disabled=[col for col in st.session_state.original_data.columns if col not in ['available_from', 'available_to', 'allow_negative']],
+        disabled=st.session_state.product_columns + [VERSION_COLUMN],
         hide_index=True,
         use_container_width=True,
         key="data_editor"
@@ -141,53 +408,87 @@ def main_app():
 
     with col1:
         if st.button("Save Changes", use_container_width=True):
+            new = edited_df.set_index('code')[EDITABLE_COLUMNS]
+            orig = st.session_state.baseline[EDITABLE_COLUMNS].reindex(new.index)
+
+            # Check for changes in available_from, available_to, or allow_negative, per cell.
+            # Two missing values count as equal, matching a plain `!=` on None.
+            changed_cells = orig.ne(new) & ~(orig.isna() & new.isna())
+            changed_cells = changed_cells[changed_cells.any(axis=1)]
+
+            # Each payload only carries the fields that changed
             updates = []
-            original_indexed = st.session_state.original_data.set_index('code')
-            
-            for index, row in edited_df.iterrows():
-                product_code = row['code']
-                original_row = original_indexed.loc[product_code]
-
-                # Check for changes in available_from, available_to, or allow_negative
-                if (original_row['available_from'] != row['available_from'] or 
-                    original_row['available_to'] != row['available_to'] or
-                    original_row['allow_negative'] != row['allow_negative']):
-                    
-                    updates.append({
-                        "code": product_code,
-                        "available_from": format_time_for_db(row['available_from']),
-                        "available_to": format_time_for_db(row['available_to']),
-                        "allow_negative": bool(row['allow_negative']) # Ensure it's a boolean
-                    })
-                    logging.info(f"Change detected for '{product_code}': "
-                                 f"Start: {row['available_from']}, End: {row['available_to']}, "
-                                 f"Allow Negative: {row['allow_negative']}")
+            for code, changed_flags in zip(changed_cells.index, changed_cells.itertuples(index=False)):
+                update = {"code": code}
+                for col, changed in zip(EDITABLE_COLUMNS, changed_flags):
+                    if not changed:
+                        continue
+                    value = new.at[code, col]
+                    update[col] = bool(value) if col == 'allow_negative' else format_time_for_db(value)
+                updates.append(update)
+
+            if logging.getLogger().isEnabledFor(logging.INFO):
+                for update in updates:
+                    changes = ", ".join(f"{k}: {v}" for k, v in update.items() if k != 'code')
+                    logging.info(f"Change detected for '{update['code']}': {changes}")
 
             if updates:
+                saved, conflicts = {}, []
                 try:
                     logging.info(f"Sending {len(updates)} updates to Supabase (products table).")
-                    for update in updates:
-                        # Update the 'products' table directly
-                        # Only include the fields that are being updated
-                        update_payload = {k: update[k] for k in ["available_from", "available_to", "allow_negative"]}
-                        supabase.table("products").update(update_payload).eq("code", update['code']).execute()
-                    st.toast(f"Saved changes for {len(updates)} product(s).", icon="✅")
+                    for start in range(0, len(updates), UPDATE_BATCH_SIZE):
+                        batch_saved, batch_conflicts = update_products(
+                            updates[start:start + UPDATE_BATCH_SIZE], st.session_state.baseline[VERSION_COLUMN]
+                        )
+                        saved.update(batch_saved)
+                        conflicts.extend(batch_conflicts)
+                except Exception as e:
+                    # Earlier batches are committed; they still advance the baseline below
+                    partial = f" {len(saved)} product(s) were saved before the error." if saved else ""
+                    st.toast(f"Error saving to Supabase: {e}.{partial}", icon="🔥")
+                    logging.error(f"Supabase update failed for 'products' table after {len(saved)} saved row(s): {e}", exc_info=True)
+
+                if saved:
+                    st.toast(f"Saved changes for {len(saved)} product(s).", icon="✅")
                     logging.info("Supabase update successful for 'products' table.")
-                    
-                    # Update original_data in session state to reflect the saved changes
+
+                    # Move the baseline forward for the saved rows
                     # This ensures that the next comparison correctly identifies only new changes.
-                    st.session_state.original_data = edited_df.copy()
+                    saved_codes = list(saved)
+                    st.session_state.baseline.loc[saved_codes, EDITABLE_COLUMNS] = new.loc[saved_codes]
+                    st.session_state.baseline.loc[saved_codes, VERSION_COLUMN] = pd.Series(saved)
+                    # Keep the editor's data in step too; otherwise a reset of the editor state
+                    # would show pre-save values that the next save writes back
+                    patch_session_data(st.session_state.baseline.loc[saved_codes])
+                    invalidate_products_cache(st.session_state.baseline.loc[saved_codes])
 
-                except Exception as e:
-                    st.toast(f"Error saving to Supabase: {e}", icon="🔥")
-                    logging.error(f"Supabase update failed for 'products' table: {e}", exc_info=True)
+                if conflicts:
+                    try:
+                        # Rebase the conflicting rows onto the database values, in both the baseline
+                        # and the editor's data, so the admin re-applies edits over the current values
+                        current = fetch_current_versions(conflicts)
+                        st.session_state.baseline.loc[current.index] = current
+                        patch_session_data(current)
+                        invalidate_products_cache(current)
+                        details = "; ".join(
+                            f"{code} (Start: {row['available_from']}, End: {row['available_to']}, "
+                            f"Allow Negative: {row['allow_negative']})"
+                            for code, row in current.iterrows()
+                        )
+                        st.toast(f"{len(conflicts)} product(s) were changed by another admin and not saved. "
+                                 f"Current values: {details}. Edit and save again to overwrite.", icon="⚠️")
+                        logging.warning(f"Save conflict on products {conflicts}; current values: {details}")
+                    except Exception as e:
+                        st.toast(f"{len(conflicts)} product(s) were changed by another admin and not saved. "
+                                 f"Could not load their current values: {e}", icon="⚠️")
+                        logging.error(f"Could not load current values for conflicting products {conflicts}: {e}", exc_info=True)
             else:
                 st.toast("No changes to save.", icon="🤷")
             
     with col2:
         if st.button("Logout", use_container_width=False):
             logging.info(f"User '{st.session_state.get('username', 'unknown')}' logged out.")
-            for key in ['logged_in', 'login_time', 'username']:
+            for key in ['logged_in', 'expiry_mono', 'username']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.toast("Logged out.", icon="👋")
@@ -208,7 +509,7 @@ def login_page():
         if st.button("Login", key="login_button"):
             if username == "admin" and password == "admin1234":
                 st.session_state.logged_in = True
-                st.session_state.login_time = datetime.now()
+                st.session_state.expiry_mono = time.monotonic() + SESSION_TIMEOUT_SECONDS
                 st.session_state.username = username
                 st.toast("Logged in successfully!", icon="✅")
                 logging.info(f"User '{username}' logged in successfully.")
@@ -220,11 +521,11 @@ def login_page():
 # --- Page Routing ---
 session_is_active = False
 if st.session_state.get('logged_in'):
-    elapsed_time = datetime.now() - st.session_state.get('login_time', datetime.min)
-    if elapsed_time < timedelta(minutes=5):
+    # Monotonic deadline set at login: a single float compare, unaffected by wall-clock changes
+    if time.monotonic() < st.session_state.get('expiry_mono', 0):
         session_is_active = True
     else:
-        for key in ['logged_in', 'login_time', 'username']:
+        for key in ['logged_in', 'expiry_mono', 'username']:
             if key in st.session_state:
                 del st.session_state[key]
         st.toast("Session expired. Please log in again.", icon="⏳")